@@ -3,45 +3,61 @@
 """
 高德地图API客户端 - 用于获取驾车路径规划的距离、时间和路线
 """
+import asyncio
+from collections import OrderedDict
+import aiohttp
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import logging
+import re
 import time
 from typing import Dict, Tuple, Optional, List
 
-class AmapAPI:
+logger = logging.getLogger(__name__)
+
+# polyline 中含两个及以上逗号的点（分号分隔，每个点应恰好一个逗号）
+_MULTI_COMMA_POINT_RE = re.compile(r",[^;]*,")
+
+class BaseAmapAPI:
+    """同步/异步客户端共用的缓存、请求参数构建与响应解析逻辑"""
     def __init__(self, api_key: str):
         """初始化高德地图API客户端"""
         self.api_key = api_key
         self.base_url = "https://restapi.amap.com/v3/direction/driving"
-        # 添加缓存以避免重复请求
-        self.cache = {}
+        # 添加缓存以避免重复请求：LRU淘汰，最近使用的条目在末尾
+        self.cache = OrderedDict()
+        self.cache_max = 1024  # 缓存最大条目数
         self.cache_timeout = 3600  # 缓存有效期（秒）
-        
-    def get_driving_info(self, origin: Tuple[float, float], destination: Tuple[float, float], waypoints: List[Tuple[float, float]] = None) -> Optional[Dict[str, any]]:
-        """
-        获取两点间的驾车距离和时间
-        
-        参数:
-            origin: (longitude, latitude) - 起点坐标
-            destination: (longitude, latitude) - 终点坐标
-            
-        返回:
-            Dict - 包含distance（米）和duration（秒）的字典，如果请求失败则返回None
-        """
-        # 构建缓存键，包含途经点信息
-        cache_key = (origin[0], origin[1], destination[0], destination[1]) + tuple((w[0], w[1]) for w in (waypoints or []))
-        
-        # 检查缓存
+    
+    def _cache_key(self, origin: Tuple[float, float], destination: Tuple[float, float], waypoints: List[Tuple[float, float]] = None) -> tuple:
+        """构建缓存键，包含途经点信息"""
+        return (origin[0], origin[1], destination[0], destination[1]) + tuple((w[0], w[1]) for w in (waypoints or []))
+    
+    def _cache_get(self, cache_key: tuple) -> Optional[Dict[str, any]]:
+        """查询缓存，未命中或已过期时返回None"""
         current_time = time.time()
         if cache_key in self.cache:
             cached_data, timestamp = self.cache[cache_key]
             if current_time - timestamp < self.cache_timeout:
+                self.cache.move_to_end(cache_key)
                 return cached_data.copy()
             else:
                 # 缓存已过期，移除
                 del self.cache[cache_key]
-        
-        # 构建请求参数
+        return None
+    
+    def _cache_put(self, cache_key: tuple, result: Dict[str, any]) -> None:
+        """保存到缓存，超过容量时淘汰最久未使用的条目"""
+        self.cache[cache_key] = (result, time.time())
+        self.cache.move_to_end(cache_key)
+        if len(self.cache) > self.cache_max:
+            self.cache.popitem(last=False)
+    
+    def _build_params(self, origin: Tuple[float, float], destination: Tuple[float, float], waypoints: List[Tuple[float, float]] = None) -> Dict[str, str]:
+        """构建请求参数"""
         params = {
             'key': self.api_key,
             'origin': f"{origin[0]},{origin[1]}",
@@ -54,93 +70,218 @@ class AmapAPI:
         if waypoints and len(waypoints) > 0:
             waypoints_str = ';'.join([f"{w[0]},{w[1]}" for w in waypoints])
             params['waypoints'] = f"{waypoints_str}"  # 在途经点前添加drag前缀
-            print(f"发送给高德API的途经点=: {params['waypoints']}")  # 添加调试信息
+            logger.debug("发送给高德API的途经点=: %s", params['waypoints'])  # 添加调试信息
         
-        try:
-            # 发送请求
-            time.sleep(0.5)  # 避免请求频率过快
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
+        return params
+    
+    def _parse_response(self, data: Dict[str, any], params: Dict[str, str]) -> Optional[Dict[str, any]]:
+        """
+        解析高德API的JSON响应
+        
+        返回:
+            Dict - 包含distance（米）、duration（秒）和polyline的字典，如果API返回错误则返回None
+        """
+        # 检查响应状态
+        if data.get('status') == '1' and data.get('route') and data['route'].get('paths'):
+            path = data['route']['paths'][0]
             
-            # 解析响应
-            data = response.json()
+            # 调试信息：打印获取到的完整路径数据
+            # print(f"获取到的路径数据: distance={path.get('distance')}, duration={path.get('duration')}")
+            # print(f"polyline数据长度: {len(path.get('polyline', ''))} 字符")
+            # print(f"路径数据完整内容: {path}")  # 打印完整的path对象以检查polyline的位置
+            # print(f"API响应完整内容: {data}")  # 打印完整的API响应以了解数据结构
             
-            # 检查响应状态
-            if data.get('status') == '1' and data.get('route') and data['route'].get('paths'):
-                path = data['route']['paths'][0]
-                
-                # 调试信息：打印获取到的完整路径数据
-                # print(f"获取到的路径数据: distance={path.get('distance')}, duration={path.get('duration')}")
-                # print(f"polyline数据长度: {len(path.get('polyline', ''))} 字符")
-                # print(f"路径数据完整内容: {path}")  # 打印完整的path对象以检查polyline的位置
-                # print(f"API响应完整内容: {data}")  # 打印完整的API响应以了解数据结构
-                
-                # 构建结果字典
-                result = {
-                    'distance': float(path.get('distance', 0)),  # 米
-                    'duration': float(path.get('duration', 0)),  # 秒
-                    'polyline': path.get('polyline', '')  # 添加polyline数据
-                }
-                
-                # 检查是否有其他可能包含路线信息的字段
-                if 'steps' in path:
-                    print(f"路径包含{len(path['steps'])}个步骤")
-                    # 尝试从steps中提取polyline数据
-                    if not result['polyline']:
-                        combined_polyline = []
-                        for step in path['steps']:
-                            if 'polyline' in step and step['polyline']:
-                                combined_polyline.append(step['polyline'])
-                        if combined_polyline:
-                            result['polyline'] = ';'.join(combined_polyline)
-                            print(f"从steps中合并polyline数据，长度: {len(result['polyline'])} 字符")
-                    # 检查路径经过的途经点
-                    if 'waypoints' in params:
-                        print(f"请求的途经点: {params['waypoints']}")
-                
-                # 保存到缓存
-                self.cache[cache_key] = (result, current_time)
-                
-                return result
-            else:
-                print(f"高德地图API返回错误: {data.get('info', '未知错误')}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            print(f"请求高德地图API时出错: {str(e)}")
-            return None
-        except json.JSONDecodeError:
-            print("解析高德地图API响应时出错")
+            # 构建结果字典
+            result = {
+                'distance': float(path.get('distance', 0)),  # 米
+                'duration': float(path.get('duration', 0)),  # 秒
+                'polyline': path.get('polyline', '')  # 添加polyline数据
+            }
+            
+            # 检查是否有其他可能包含路线信息的字段
+            if 'steps' in path:
+                logger.debug("路径包含%d个步骤", len(path['steps']))
+                # 尝试从steps中提取polyline数据
+                if not result['polyline']:
+                    combined_polyline = []
+                    for step in path['steps']:
+                        if 'polyline' in step and step['polyline']:
+                            combined_polyline.append(step['polyline'])
+                    if combined_polyline:
+                        result['polyline'] = ';'.join(combined_polyline)
+                        logger.debug("从steps中合并polyline数据，长度: %d 字符", len(result['polyline']))
+                # 检查路径经过的途经点
+                if 'waypoints' in params:
+                    logger.debug("请求的途经点: %s", params['waypoints'])
+            
+            return result
+        else:
+            logger.warning("高德地图API返回错误: %s", data.get('info', '未知错误'))
             return None
     
+    def parse_polyline_np(self, polyline_str: str) -> np.ndarray:
+        """
+        解析polyline字符串为坐标数组（一次性交给NumPy解析，不逐点循环）
+        
+        参数:
+            polyline_str: 高德地图API返回的polyline字符串
+        
+        返回:
+            np.ndarray: 形状为 (N, 2) 的坐标数组，每行为 (longitude, latitude)
+        
+        异常:
+            ValueError: polyline格式错误
+        """
+        # 去掉空的坐标段，与逐点解析时跳过空点的行为一致
+        while ';;' in polyline_str:
+            polyline_str = polyline_str.replace(';;', ';')
+        polyline_str = polyline_str.strip(';')
+        if not polyline_str:
+            return np.empty((0, 2), dtype=np.float64)
+        
+        # 逐点校验格式：逗号数等于点数且没有点含多个逗号，即每个点恰好一个逗号；
+        # 只校验总数值个数时，如 "1,2,3;4" 会被静默解析成错位的坐标
+        n_points = polyline_str.count(';') + 1
+        if polyline_str.count(',') != n_points or _MULTI_COMMA_POINT_RE.search(polyline_str):
+            raise ValueError("坐标点必须为 longitude,latitude 格式")
+        arr = np.fromstring(polyline_str.replace(';', ','), sep=',', dtype=np.float64)
+        if arr.size != 2 * n_points:
+            raise ValueError("坐标点必须为 longitude,latitude 格式")
+        return arr.reshape(-1, 2)
+    
     def parse_polyline(self, polyline_str: str) -> List[Tuple[float, float]]:
         """
         解析polyline字符串为坐标点列表
         
         参数:
             polyline_str: 高德地图API返回的polyline字符串
-            
+        
         返回:
             List[Tuple[float, float]]: 坐标点列表 [(longitude, latitude), ...]
         """
         if not polyline_str:
             return []
         
-        coordinates = []
         try:
-            # 分割polyline字符串
-            points = polyline_str.split(';')
-            for point in points:
-                if point:
-                    lon, lat = map(float, point.split(','))
-                    coordinates.append((lon, lat))
-        except Exception as e:
-            print(f"解析polyline时出错: {e}")
+            coordinates = self.parse_polyline_np(polyline_str)
+        except ValueError as e:
+            logger.warning("解析polyline时出错: %s", e)
             return []
         
-        return coordinates
+        return list(map(tuple, coordinates.tolist()))
     
     def clear_cache(self) -> None:
         """清除缓存"""
         self.cache.clear()
-        print("高德地图API缓存已清除")
+        logger.info("高德地图API缓存已清除")
+
+class AmapAPI(BaseAmapAPI):
+    def __init__(self, api_key: str):
+        """初始化高德地图API客户端（同步版本，基于requests）"""
+        super().__init__(api_key)
+        # 复用同一个会话：保持 HTTPS 长连接，避免每次请求重新握手
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                              max_retries=Retry(total=3, backoff_factor=0.3))
+        self.session.mount("https://", adapter)
+    
+    def get_driving_info(self, origin: Tuple[float, float], destination: Tuple[float, float], waypoints: List[Tuple[float, float]] = None) -> Optional[Dict[str, any]]:
+        """
+        获取两点间的驾车距离和时间
+        
+        参数:
+            origin: (longitude, latitude) - 起点坐标
+            destination: (longitude, latitude) - 终点坐标
+        
+        返回:
+            Dict - 包含distance（米）和duration（秒）的字典，如果请求失败则返回None
+        """
+        # 检查缓存
+        cache_key = self._cache_key(origin, destination, waypoints)
+        cached_data = self._cache_get(cache_key)
+        if cached_data is not None:
+            return cached_data
+        
+        params = self._build_params(origin, destination, waypoints)
+        
+        try:
+            # 发送请求
+            response = self.session.get(self.base_url, params=params, timeout=10)
+            response.raise_for_status()
+            
+            # 解析响应
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error("请求高德地图API时出错: %s", e)
+            return None
+        except json.JSONDecodeError:
+            logger.error("解析高德地图API响应时出错")
+            return None
+        
+        result = self._parse_response(data, params)
+        if result is not None:
+            self._cache_put(cache_key, result)
+        return result
+
+class AsyncAmapAPI(BaseAmapAPI):
+    def __init__(self, api_key: str, session: aiohttp.ClientSession):
+        """
+        初始化高德地图API客户端（异步版本，基于aiohttp）
+        
+        参数:
+            api_key: 高德地图API Key
+            session: 共享的aiohttp会话，由调用方负责创建和关闭
+        """
+        super().__init__(api_key)
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(total=10)
+        # 与同步版本的 Retry(total=3, backoff_factor=0.3) 对应：连接错误和超时最多重试3次，间隔按指数退避
+        self.max_retries = 3
+        self.backoff_factor = 0.3
+    
+    async def get_driving_info(self, origin: Tuple[float, float], destination: Tuple[float, float], waypoints: List[Tuple[float, float]] = None) -> Optional[Dict[str, any]]:
+        """
+        获取两点间的驾车距离和时间，等待网络响应期间不阻塞事件循环
+        
+        参数:
+            origin: (longitude, latitude) - 起点坐标
+            destination: (longitude, latitude) - 终点坐标
+        
+        返回:
+            Dict - 包含distance（米）和duration（秒）的字典，如果请求失败则返回None
+        """
+        # 检查缓存
+        cache_key = self._cache_key(origin, destination, waypoints)
+        cached_data = self._cache_get(cache_key)
+        if cached_data is not None:
+            return cached_data
+        
+        params = self._build_params(origin, destination, waypoints)
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                # 发送请求
+                async with self.session.get(self.base_url, params=params, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    
+                    # 解析响应
+                    data = await response.json(content_type=None)
+                break
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    logger.error("请求高德地图API时出错: %s", e)
+                    return None
+                delay = self.backoff_factor * (2 ** attempt)
+                logger.warning("请求高德地图API失败，%.1f秒后重试: %s", delay, e)
+                await asyncio.sleep(delay)
+            except aiohttp.ClientError as e:
+                logger.error("请求高德地图API时出错: %s", e)
+                return None
+            except json.JSONDecodeError:
+                logger.error("解析高德地图API响应时出错")
+                return None
+        
+        result = self._parse_response(data, params)
+        if result is not None:
+            self._cache_put(cache_key, result)
+        return result
@@ -1,6 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
+import aiohttp
+import logging
+import numpy as np
+import os
 import uvicorn
 import time
 
@@ -17,10 +22,44 @@ class PythonRoutePlannerModule:
 cpp_planner = PythonRoutePlannerModule()
 
 # 导入高德API客户端
-from amap_api import AmapAPI
+from amap_api import AsyncAmapAPI
 
 app = FastAPI(title="路径规划API")
 
+# 按API Key复用高德客户端，使结果缓存在请求之间生效；所有客户端共享同一个连接池
+# API Key 由请求方提供，按LRU淘汰以限制客户端（及其各自的结果缓存）数量，最近使用的在末尾
+amap_clients: "OrderedDict[str, AsyncAmapAPI]" = OrderedDict()
+AMAP_CLIENTS_MAX = 16
+
+@app.on_event("startup")
+async def configure_logging():
+    # 多worker模式下每个worker是独立进程，不会执行 __main__ 中的配置，需在启动时各自配置
+    # 默认INFO级别：高德客户端的调试日志（logger.debug）不会被格式化输出
+    logging.basicConfig(level=logging.INFO)
+
+@app.on_event("startup")
+async def create_amap_session():
+    app.state.amap_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+    )
+
+@app.on_event("shutdown")
+async def close_amap_session():
+    amap_clients.clear()
+    await app.state.amap_session.close()
+
+def get_amap_client(api_key: str) -> AsyncAmapAPI:
+    """获取（或创建）指定API Key对应的高德客户端"""
+    client = amap_clients.get(api_key)
+    if client is None:
+        client = AsyncAmapAPI(api_key, app.state.amap_session)
+        amap_clients[api_key] = client
+        if len(amap_clients) > AMAP_CLIENTS_MAX:
+            amap_clients.popitem(last=False)
+    else:
+        amap_clients.move_to_end(api_key)
+    return client
+
 # 请求模型
 class RouteRequest(BaseModel):
     optimization_target: str  # driving_time, driving_distance, straight_distance
@@ -46,19 +85,14 @@ class RouteResponse(BaseModel):
     end_point: Tuple[float, float]
     waypoints_order: Optional[List[int]] = None
 
-def convert_to_cpp_coords(py_coords: List[Tuple[float, float]]) -> List:
-    """转换Python坐标列表为C++ Coordinate对象列表"""
-    return [cpp_planner.Coordinate(lon, lat) for lon, lat in py_coords]
-
 def get_straight_route_result(request: RouteRequest) -> RouteResponse:
     """使用C++逻辑计算直线距离规划结果"""
     if not cpp_planner_available:
         raise HTTPException(status_code=501, detail="直线距离规划功能不可用: 无法加载route_planner模块")
     
-    # 转换坐标格式
-    starts = [cpp_planner.Coordinate(request.origin[0], request.origin[1])]
-    ends = [cpp_planner.Coordinate(request.destination[0], request.destination[1])]
-    waypoints = convert_to_cpp_coords(request.waypoints or [])
+    # 转换坐标格式：起点、途经点、终点依次排列为 (N, 2) 数组
+    waypoints = request.waypoints or []
+    coords = np.array([request.origin, *waypoints, request.destination], dtype=np.float64)
 
     # 配置算法参数
     config = cpp_planner.AlgorithmConfig(
@@ -71,43 +105,30 @@ def get_straight_route_result(request: RouteRequest) -> RouteResponse:
 
     # 调用C++规划器
     planner = cpp_planner.RoutePlanner(config)
-    result = planner.plan_route(starts, waypoints, ends)
+    result = planner.plan_route(coords[:, 0], coords[:, 1], 1, len(waypoints))
     planner.clear_distance_cache()
 
-    # 提取途经点顺序
-    waypoints_order = []
-    if request.waypoints:
-        original_waypoints = { (p.longitude, p.latitude): i 
-                             for i, p in enumerate(waypoints) }
-        for p in result.path[1:-1]:  # 排除起点和终点
-            coord = (p.longitude, p.latitude)
-            if coord in original_waypoints:
-                waypoints_order.append(original_waypoints[coord])
+    # 提取途经点顺序：路径索引中排除起点和终点，途经点索引从 1 开始
+    waypoints_order = [i - 1 for i in result.path_indices[1:-1]]
 
     # 构建响应
     return RouteResponse(
         optimization_target="straight_distance",
         total_distance=result.total_distance,
-        path=[(p.longitude, p.latitude) for p in result.path],
+        path=result.path.tolist(),
         execution_time_ms=result.execution_time_ms,
         start_point=request.origin,
         end_point=request.destination,
         waypoints_order=waypoints_order if waypoints_order else None
     )
 
-def convert_to_cpp_coords(py_coords: List[Tuple[float, float]]) -> List:
-    """转换Python坐标列表为C++ Coordinate对象列表"""
-    if not cpp_planner_available:
-        return []
-    return [cpp_planner.Coordinate(lon, lat) for lon, lat in py_coords]
-
-def get_driving_route_result(request: RouteRequest) -> RouteResponse:
+async def get_driving_route_result(request: RouteRequest) -> RouteResponse:
     """使用高德API获取驾车路线结果"""
     start_time = time.time()
-    amap = AmapAPI(request.amap_key)
+    amap = get_amap_client(request.amap_key)
     
-    # 调用高德API
-    driving_info = amap.get_driving_info(
+    # 调用高德API（等待响应期间事件循环可处理其他请求）
+    driving_info = await amap.get_driving_info(
         origin=request.origin,
         destination=request.destination,
         waypoints=request.waypoints
@@ -142,11 +163,15 @@ async def plan_route(request: RouteRequest):
         if request.optimization_target == "straight_distance":
             return get_straight_route_result(request)
         elif request.optimization_target in ["driving_time", "driving_distance"]:
-            return get_driving_route_result(request)
+            return await get_driving_route_result(request)
         else:
             raise HTTPException(status_code=400, detail="无效的优化目标")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # 每个CPU核心一个worker进程；多worker时需以导入字符串形式传入应用
+    # loop/http 为 auto 时，安装了 uvloop/httptools（uvicorn[standard]）即自动启用，Windows 下回退到 asyncio
+    # 注意：高德结果缓存与精确解缓存都在进程内，各worker之间不共享
+    uvicorn.run("main:app", host="0.0.0.0", port=8001, workers=os.cpu_count(),
+                loop="auto", http="auto", log_level="info")
\ No newline at end of file
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路径规划器 Numba 加速内核
+模拟退火（2-opt + or-opt 邻域）、2-opt 与 Held-Karp 精确解的内层循环，在预计算的距离矩阵上以本地代码运行
+所有函数只接收 NumPy 数组：D 为 float32[:, ::1] 距离矩阵，path 为 int64[::1] 排列
+对外内核按 float32 签名提前编译，单精度数据可使用更宽的 SIMD 通道
+"""
+
+import numpy as np
+from numba import njit, float32, float64, int64
+
+
+# 计算路径总距离
+@njit(cache=True)
+def _path_distance(D, path):
+    total = 0.0
+    for k in range(path.shape[0] - 1):
+        total += D[path[k], path[k + 1]]
+    return total
+
+
+# 原地反转 path[i..j]
+@njit(cache=True)
+def _reverse(path, i, j):
+    while i < j:
+        tmp = path[i]
+        path[i] = path[j]
+        path[j] = tmp
+        i += 1
+        j -= 1
+
+
+# 反转 path[i..j] 带来的距离变化（开放路径，只有 i-1/i 与 j/j+1 两条边改变；i == 0 时只改变后一条）
+@njit(cache=True)
+def _two_opt_delta(D, path, i, j):
+    b = path[i]
+    c = path[j]
+    delta = 0.0
+    if i > 0:
+        a = path[i - 1]
+        delta += D[a, c] - D[a, b]
+    if j + 1 < path.shape[0]:
+        d = path[j + 1]
+        delta += D[b, d] - D[c, d]
+    return delta
+
+
+# 把 path[i..j] 整段移到 path[p] 与 path[p+1] 之间（-1 <= p < i-1 或 p > j，p == -1 表示移到最前面）带来的距离变化
+# 开放路径上至多改变 6 条边：段两端的旧边、段被取走后的补边、插入位置的旧边与两条新边；位于路径端点时相应的边不存在
+@njit(cache=True)
+def _or_opt_delta(D, path, i, j, p):
+    n = path.shape[0]
+    s0 = path[i]
+    s1 = path[j]
+    delta = 0.0
+    if i > 0:
+        delta -= D[path[i - 1], s0]
+    if j + 1 < n:
+        delta -= D[s1, path[j + 1]]
+        if i > 0:
+            delta += D[path[i - 1], path[j + 1]]
+    if p >= 0:
+        delta += D[path[p], s0]
+    if p + 1 < n:
+        delta += D[s1, path[p + 1]]
+        if p >= 0:
+            delta -= D[path[p], path[p + 1]]
+    return delta
+
+
+# 原地执行 or-opt 移动：三次反转完成区间轮转，不分配新数组
+@njit(cache=True)
+def _or_opt_move(path, i, j, p):
+    if p > j:
+        _reverse(path, i, j)
+        _reverse(path, j + 1, p)
+        _reverse(path, i, p)
+    else:
+        _reverse(path, p + 1, i - 1)
+        _reverse(path, i, j)
+        _reverse(path, p + 1, j)
+
+
+# 2-opt 局部搜索，返回优化后的新排列；eps 为改进判定阈值，由调用方传入
+@njit(int64[::1](float32[:, ::1], int64[::1], float64), cache=True)
+def _two_opt(D, path, eps):
+    path = path.copy()
+    n = path.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                if _two_opt_delta(D, path, i, j) < -eps:
+                    _reverse(path, i, j)
+                    improved = True
+    return path
+
+
+# 模拟退火（2-opt 反转与 or-opt 段移动各占一半），从 path 出发，返回找到的最优排列
+@njit(int64[::1](float32[:, ::1], int64[::1], int64, float64, float64, int64), cache=True)
+def _sa(D, path, max_iter, initial_temperature, cooling_rate, seed):
+    np.random.seed(seed)
+    n = path.shape[0]
+    current = path.copy()
+    # best 为预分配的快照缓冲区，只在即将离开最优状态时才复制
+    best = path.copy()
+    current_dist = _path_distance(D, current)
+    best_dist = current_dist
+    current_is_best = True
+    temp = initial_temperature
+    # or-opt 段长上限：段外至少还要留出一个插入位置
+    max_seg = min(3, n - 1)
+
+    for _ in range(max_iter):
+        # 两种移动都覆盖整条路径，包括贪心起点所在的位置 0
+        or_opt = max_seg >= 1 and np.random.random() < 0.5
+        if or_opt:
+            # 随机选择长度 1..max_seg 的段 [i, j] 和段外的插入位置 p（共 n-seg 个）
+            seg = np.random.randint(1, max_seg + 1)
+            i = np.random.randint(0, n - seg + 1)
+            j = i + seg - 1
+            r = np.random.randint(0, n - seg)
+            p = r - 1 if r < i else r + seg
+            delta = _or_opt_delta(D, current, i, j, p)
+        else:
+            # 随机选择两个点进行交换
+            i = np.random.randint(0, n)
+            j = np.random.randint(0, n)
+            if i == j:
+                continue
+            if i > j:
+                i, j = j, i
+            p = 0
+            # 增量计算能量差，只涉及被替换的两条边
+            delta = _two_opt_delta(D, current, i, j)
+
+        if delta < 0 or (temp > 1e-9 and np.random.random() < np.exp(-delta / temp)):
+            if current_is_best and delta >= 0:
+                best[:] = current
+                current_is_best = False
+            if or_opt:
+                _or_opt_move(current, i, j, p)
+            else:
+                _reverse(current, i, j)
+            current_dist += delta
+            if current_dist < best_dist:
+                best_dist = current_dist
+                current_is_best = True
+
+        # 降温
+        temp *= cooling_rate
+        if temp < 1.0:
+            break
+
+    if current_is_best:
+        return current
+    return best
+
+
+# Held-Karp 状态压缩动态规划求开放路径的精确解（起点不限），返回最优排列
+@njit(int64[::1](float32[:, ::1]), cache=True)
+def _held_karp(D):
+    n = D.shape[0]
+    size = 1 << n
+    # dp[S, i]：恰好访问集合 S 且停在 i 的最短路径长度
+    dp = np.full((size, n), np.inf)
+    parent = np.full((size, n), -1, dtype=np.int32)
+    for i in range(n):
+        dp[1 << i, i] = 0.0
+
+    # S | (1 << j) 总大于 S，按数值递增遍历即可保证子集先于超集
+    for S in range(1, size):
+        for i in range(n):
+            if not (S >> i) & 1:
+                continue
+            cost = dp[S, i]
+            if cost == np.inf:
+                continue
+            for j in range(n):
+                if (S >> j) & 1:
+                    continue
+                T = S | (1 << j)
+                c = cost + D[i, j]
+                if c < dp[T, j]:
+                    dp[T, j] = c
+                    parent[T, j] = i
+
+    # 选择最优终点并沿 parent 回溯
+    full = size - 1
+    last = 0
+    for i in range(1, n):
+        if dp[full, i] < dp[full, last]:
+            last = i
+    path = np.empty(n, dtype=np.int64)
+    S = full
+    for k in range(n - 1, -1, -1):
+        path[k] = last
+        prev = parent[S, last]
+        S ^= 1 << last
+        last = prev
+    return path
@@ -8,8 +8,30 @@
 import math
 import random
 import time
-import itertools
-from typing import List, Tuple, Dict, Optional
+from collections import OrderedDict
+from typing import List, Tuple, Optional, Sequence
+
+import numpy as np
+
+# 导入 Numba 加速内核（可选依赖，不可用时使用纯 Python 实现）
+try:
+    from route_planner_numba import _sa, _two_opt, _held_karp
+    numba_available = True
+except ImportError:
+    numba_available = False
+
+# 标量 Haversine 使用的数学函数绑定为模块级名称，避免每次调用查找 math 属性
+_sin, _cos, _sqrt, _asin = math.sin, math.cos, math.sqrt, math.asin
+_DEG2RAD = math.pi / 180.0
+
+# 精确解只依赖途经点坐标：跨 plan_route 调用缓存最近的结果（LRU），键为途经点坐标的字节串
+EXACT_CACHE_MAX = 8
+_exact_order_cache: "OrderedDict[bytes, List[int]]" = OrderedDict()
+
+# 2-opt 改进判定的相对阈值：实际阈值为该系数乘以子矩阵中的最大距离，约为其 float32 舍入误差的 8 倍，
+# 避免舍入误差导致反复反转同一区间，又不会在近距离点之间吞掉真实的改进
+# Numba 与纯Python实现共用此定义（换算后作为参数传给 _two_opt）
+IMPROVE_REL_EPS = 1e-6
 
 # --- 地理坐标类 ---
 class Coordinate:
@@ -20,43 +42,67 @@ class Coordinate:
     def __repr__(self):
         return f"Coordinate({self.longitude:.6f}, {self.latitude:.6f})"
 
-# --- 距离计算器（支持缓存可选）---
+# --- 距离计算器 ---
+# 规划时的距离查询统一由 calculate_matrix 生成的 N×N 矩阵承担（矩阵本身即缓存），
+# enable_cache 参数仅为兼容旧接口保留
 class DistanceCalculator:
     def __init__(self, enable_cache: bool = True):
-        self.distance_cache: Dict[Tuple[int, int], float] = {}
-        self.use_cache = enable_cache
+        pass
     
-    # 清理缓存：在大规模计算后调用，释放内存
+    # 兼容旧接口：不再维护逐对距离缓存，无需清理
     def clear_distance_cache(self):
-        self.distance_cache.clear()
+        pass
     
     # 使用 Haversine 公式计算地球表面两点间距离
     def calculate(self, a: Coordinate, b: Coordinate) -> float:
         R = 6371000  # 地球半径（米）
-        lat1 = a.latitude * math.pi / 180.0
-        lat2 = b.latitude * math.pi / 180.0
-        delta_lat = (b.latitude - a.latitude) * math.pi / 180.0
-        delta_lon = (b.longitude - a.longitude) * math.pi / 180.0
+        lat1 = a.latitude * _DEG2RAD
+        lat2 = b.latitude * _DEG2RAD
+        s_dlat = _sin((b.latitude - a.latitude) * _DEG2RAD * 0.5)
+        s_dlon = _sin((b.longitude - a.longitude) * _DEG2RAD * 0.5)
         
-        aa = math.sin(delta_lat / 2) * math.sin(delta_lat / 2) + \
-             math.cos(lat1) * math.cos(lat2) * \
-             math.sin(delta_lon / 2) * math.sin(delta_lon / 2)
-        c = 2 * math.atan2(math.sqrt(aa), math.sqrt(1 - aa))
+        aa = s_dlat * s_dlat + _cos(lat1) * _cos(lat2) * s_dlon * s_dlon
+        # 2*asin(sqrt(aa)) 与 2*atan2(sqrt(aa), sqrt(1-aa)) 等价，少一次开方；aa 截断到 1 防止浮点误差越界
+        c = 2 * _asin(_sqrt(min(aa, 1.0)))
         return R * c
     
-    # 带缓存的距离查询（仅用于精确算法）
-    def get_distance(self, points: List[Coordinate], i: int, j: int) -> float:
-        if not self.use_cache:
-            return self.calculate(points[i], points[j])
+    # 向量化 Haversine：一次性计算所有点两两之间的距离矩阵（经纬度单位为度）
+    # 以 float64 计算、按 float32 存储：规划时带宽与内存减半，每个距离只有一次相对 6e-8 的舍入，
+    # 近距离点之间的距离同样准确（不能先把绝对坐标转成 float32，否则每个差值都会带入米级误差）
+    def calculate_matrix(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        R = 6371000  # 地球半径（米）
+        lon = np.radians(lon)
+        lat = np.radians(lat)
+        cos_lat = np.cos(lat)  # 每个点只算一次，外积即得 cos(lat_i)*cos(lat_j)
         
-        # 缓存键，确保 (i,j) 和 (j,i) 对应同一个值
-        key = (min(i, j), max(i, j))
-        if key in self.distance_cache:
-            return self.distance_cache[key]
+        # 半角差的正弦写回差值缓冲区，全程只保留两个 N×N 数组
+        sin_half_dlat = np.subtract.outer(lat, lat)
+        sin_half_dlat *= 0.5
+        np.sin(sin_half_dlat, out=sin_half_dlat)
+        sin_half_dlon = np.subtract.outer(lon, lon)
+        sin_half_dlon *= 0.5
+        np.sin(sin_half_dlon, out=sin_half_dlon)
         
-        dist = self.calculate(points[i], points[j])
-        self.distance_cache[key] = dist
-        return dist
+        a = np.multiply(sin_half_dlat, sin_half_dlat, out=sin_half_dlat)
+        sin_half_dlon *= sin_half_dlon
+        sin_half_dlon *= np.outer(cos_lat, cos_lat)
+        a += sin_half_dlon
+        # 浮点误差可能使 a 略大于 1，截断以避免 arcsin 返回 nan
+        np.minimum(a, 1.0, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * R
+        return a.astype(np.float32)
+    
+    # 向量化计算折线总长度（float64），用于输出最终路线的精确距离
+    def calculate_polyline(self, lon: np.ndarray, lat: np.ndarray) -> float:
+        R = 6371000  # 地球半径（米）
+        lon = np.radians(lon)
+        lat = np.radians(lat)
+        s_dlat = np.sin(np.diff(lat) * 0.5)
+        s_dlon = np.sin(np.diff(lon) * 0.5)
+        a = s_dlat * s_dlat + np.cos(lat[:-1]) * np.cos(lat[1:]) * s_dlon * s_dlon
+        return float((2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).sum())
 
 # --- 算法参数配置类 --- 
 class AlgorithmConfig:
@@ -65,13 +111,14 @@ class AlgorithmConfig:
         self.cooling_rate = cooling_rate    # 模拟退火冷却率
         self.initial_temperature = initial_temperature  # 初始温度
         self.max_iterations = max_iterations  # 最大迭代次数
-        self.use_cache = True               # 是否启用距离缓存
+        self.use_cache = True               # 兼容旧接口保留：距离矩阵始终预计算
         self.enable_local_search = True     # 是否启用 2-opt 后优化
 
 # --- 路径规划结果 --- 
 class RouteResult:
     def __init__(self):
-        self.path: List[Coordinate] = []
+        self.path: np.ndarray = np.empty((0, 2))   # 规划的路径，每行为 (经度, 纬度)
+        self.path_indices: List[int] = []          # 路径上每个点在输入数组中的索引
         self.total_distance: float = 0.0
         self.execution_time_ms: float = 0.0
         self.start_index: int = 0
@@ -82,43 +129,46 @@ class RoutePlanner:
     def __init__(self, config: Optional[AlgorithmConfig] = None):
         self.config = config if config else AlgorithmConfig()
         self.dist_calc = DistanceCalculator(self.config.use_cache)
-        random.seed()  # 初始化随机数生成器
+        # 全部点（起点+途经点+终点）的经度、纬度并行数组（SoA），下标即点的全局索引
+        self._lon: np.ndarray = np.empty(0)
+        self._lat: np.ndarray = np.empty(0)
+        # 全部点的距离矩阵
+        self._D: Optional[np.ndarray] = None
+        # 距离矩阵的嵌套列表形式，纯 Python 循环中按下标取值比 ndarray 更快
+        self._D_rows: List[List[float]] = []
+        self.rng = random.Random()  # 规划器独立的随机数生成器（系统熵初始化）
     
-    # 计算路径总距离
-    def calculate_path_distance(self, path: List[Coordinate]) -> float:
+    # 计算路径总距离（path 为距离矩阵中的点索引）
+    def calculate_path_distance(self, path: Sequence[int]) -> float:
         if len(path) < 2:
             return 0.0
-        total = 0.0
-        for i in range(len(path) - 1):
-            total += self.dist_calc.calculate(path[i], path[i+1])
-        return total
+        idx = np.asarray(path, dtype=np.intp)
+        return float(self._D[idx[:-1], idx[1:]].sum(dtype=np.float64))
+    
+    # 按 nodes 的顺序抽取距离子矩阵（C 连续），供 Numba 内核使用
+    def _sub_matrix(self, nodes: Sequence[int]) -> np.ndarray:
+        idx = np.asarray(nodes, dtype=np.intp)
+        return np.ascontiguousarray(self._D[np.ix_(idx, idx)])
     
-    # 构造最近邻路径（贪心初始化）
-    def construct_greedy_path(self, waypoints: List[Coordinate]) -> List[int]:
-        n = len(waypoints)
-        path = list(range(n))
-        visited = [False] * n
+    # 构造最近邻路径（贪心初始化），返回 nodes 的一个排列
+    def construct_greedy_path(self, nodes: Sequence[int]) -> List[int]:
+        n = len(nodes)
+        D = self._sub_matrix(nodes)
+        visited = np.zeros(n, dtype=bool)
         
-        current = random.randint(0, n-1)
-        path[0] = current
+        current = self.rng.randint(0, n-1)
         visited[current] = True
+        path = [current]
         
-        for i in range(1, n):
-            best_dist = float('inf')
-            next_point = current
-            for j in range(n):
-                if visited[j]:
-                    continue
-                d = self.dist_calc.calculate(waypoints[current], waypoints[j])
-                if d < best_dist:
-                    best_dist = d
-                    next_point = j
-            if next_point != current:
-                path[i] = next_point
-                visited[next_point] = True
-                current = next_point
+        # 每步都还有未访问点，已访问点置为无穷大后整行的 argmin 必然是未访问点
+        for _ in range(n - 1):
+            row = D[current].copy()
+            row[visited] = np.inf
+            current = int(row.argmin())
+            visited[current] = True
+            path.append(current)
         
-        return path
+        return [nodes[k] for k in path]
     
     # 2-opt 反转
     def two_opt_swap(self, path: List[int], i: int, j: int):
@@ -127,133 +177,278 @@ class RoutePlanner:
             i += 1
             j -= 1
     
+    # 反转 path[i..j] 带来的距离变化（开放路径，只有 i-1/i 与 j/j+1 两条边改变；i == 0 时只改变后一条）
+    def two_opt_delta(self, path: List[int], i: int, j: int) -> float:
+        dist = self._D_rows
+        b, c = path[i], path[j]
+        delta = 0.0
+        if i > 0:
+            a = path[i-1]
+            delta += dist[a][c] - dist[a][b]
+        if j + 1 < len(path):
+            d = path[j+1]
+            delta += dist[b][d] - dist[c][d]
+        return delta
+    
+    # 把 path[i..j] 整段移到 path[p] 与 path[p+1] 之间（-1 <= p < i-1 或 p > j，p == -1 表示移到最前面）带来的距离变化
+    # 开放路径上至多改变 6 条边：段两端的旧边、段被取走后的补边、插入位置的旧边与两条新边；位于路径端点时相应的边不存在
+    def or_opt_delta(self, path: List[int], i: int, j: int, p: int) -> float:
+        dist = self._D_rows
+        n = len(path)
+        s0, s1 = path[i], path[j]
+        delta = 0.0
+        if i > 0:
+            delta -= dist[path[i-1]][s0]
+        if j + 1 < n:
+            delta -= dist[s1][path[j+1]]
+            if i > 0:
+                delta += dist[path[i-1]][path[j+1]]
+        if p >= 0:
+            delta += dist[path[p]][s0]
+        if p + 1 < n:
+            delta += dist[s1][path[p+1]]
+            if p >= 0:
+                delta -= dist[path[p]][path[p+1]]
+        return delta
+    
+    # or-opt 段移动（原地修改 path）
+    def or_opt_move(self, path: List[int], i: int, j: int, p: int):
+        if p > j:
+            path[i:p+1] = path[j+1:p+1] + path[i:j+1]
+        else:
+            path[p+1:j+1] = path[i:j+1] + path[p+1:i]
+    
     # 2-opt 局部搜索
-    def two_opt_optimize(self, waypoints: List[Coordinate], path: List[int]) -> List[int]:
-        if not self.config.enable_local_search:
+    def two_opt_optimize(self, path: List[int]) -> List[int]:
+        if not self.config.enable_local_search or len(path) < 3:
             return path
         
+        sub = self._sub_matrix(path)
+        eps = IMPROVE_REL_EPS * float(sub.max())
+        if numba_available:
+            perm = _two_opt(sub, np.arange(len(path), dtype=np.int64), eps)
+            return [path[k] for k in perm]
+        
         improved = True
-        best_distance = self.calculate_path_distance(self.extract_path(waypoints, path))
+        path = list(path)
         n = len(path)
         
         while improved:
             improved = False
-            for i in range(1, n - 1):
+            for i in range(n - 1):
                 for j in range(i + 1, n):
-                    # 创建一个临时路径副本进行修改
-                    temp_path = path.copy()
-                    self.two_opt_swap(temp_path, i, j)
-                    new_distance = self.calculate_path_distance(self.extract_path(waypoints, temp_path))
-                    
-                    if new_distance < best_distance:
-                        path = temp_path
-                        best_distance = new_distance
+                    # 只计算被替换的两条边，改进时原地反转
+                    if self.two_opt_delta(path, i, j) < -eps:
+                        self.two_opt_swap(path, i, j)
                         improved = True
         
         return path
     
-    # 根据索引提取路径
-    def extract_path(self, waypoints: List[Coordinate], indices: List[int]) -> List[Coordinate]:
-        return [waypoints[idx] for idx in indices]
+    # 根据索引提取路径坐标，返回 (len(indices), 2) 的 (经度, 纬度) 数组
+    def extract_path(self, indices: List[int]) -> np.ndarray:
+        idx = np.asarray(indices, dtype=np.intp)
+        return np.column_stack((self._lon[idx], self._lat[idx]))
     
-    # 模拟退火算法（使用 2-opt 邻域）
-    def simulated_annealing(self, waypoints: List[Coordinate]) -> List[int]:
-        n = len(waypoints)
-        current_path = self.construct_greedy_path(waypoints)
-        best_path = current_path.copy()
-        current_dist = self.calculate_path_distance(self.extract_path(waypoints, current_path))
-        best_dist = current_dist
+    # 模拟退火算法（2-opt 反转与 or-opt 段移动各占一半），返回 nodes 的一个排列
+    def simulated_annealing(self, nodes: Sequence[int]) -> List[int]:
+        n = len(nodes)
+        current_path = self.construct_greedy_path(nodes)
         
         temp = self.config.initial_temperature
         cooling_rate = self.config.cooling_rate
         max_iter = min(self.config.max_iterations, n * n * 50)
         
+        if numba_available:
+            perm = _sa(self._sub_matrix(current_path), np.arange(n, dtype=np.int64),
+                       max_iter, temp, cooling_rate, self.rng.randrange(2**31))
+            return [current_path[k] for k in perm]
+        
+        # best_path 是预分配的快照缓冲区；current_is_best 为真时最优解就是 current_path 本身，
+        # 只有在即将离开最优状态时才复制，连续改进期间不产生任何拷贝
+        best_path = current_path.copy()
+        current_dist = self.calculate_path_distance(current_path)
+        best_dist = current_dist
+        current_is_best = True
+        
+        # 热循环中用到的方法和函数绑定为局部名称，省去每次迭代的属性查找
+        rand = self.rng.random
+        exp = math.exp
+        two_opt_delta = self.two_opt_delta
+        two_opt_swap = self.two_opt_swap
+        or_opt_delta = self.or_opt_delta
+        or_opt_move = self.or_opt_move
+        # or-opt 段长上限：段外至少还要留出一个插入位置
+        max_seg = min(3, n - 1)
+        
         for _ in range(max_iter):
-            # 随机选择两个点进行交换
-            i = random.randint(1, n-1)
-            j = random.randint(1, n-1)
-            if i == j:
-                continue
-            if i > j:
-                i, j = j, i
-            
-            # 保存当前路径用于可能的回滚
-            old_path = current_path.copy()
-            self.two_opt_swap(current_path, i, j)
-            new_dist = self.calculate_path_distance(self.extract_path(waypoints, current_path))
-            
-            # 计算能量差
-            delta = new_dist - current_dist
-            # 接受更优解或根据概率接受较差解
-            if delta < 0 or (temp > 1e-9 and random.random() < math.exp(-delta / temp)):
-                current_dist = new_dist
-                if new_dist < best_dist:
-                    best_dist = new_dist
-                    best_path = current_path.copy()
+            # 两种移动都覆盖整条路径，包括贪心起点所在的位置 0
+            or_opt = max_seg >= 1 and rand() < 0.5
+            if or_opt:
+                # 随机选择长度 1..max_seg 的段 [i, j] 和段外的插入位置 p（共 n-seg 个）
+                seg = int(rand() * max_seg) + 1
+                i = int(rand() * (n - seg + 1))
+                j = i + seg - 1
+                r = int(rand() * (n - seg))
+                p = r - 1 if r < i else r + seg
+                delta = or_opt_delta(current_path, i, j, p)
             else:
-                # 回滚到之前的路径
-                current_path = old_path
+                # 随机选择两个点进行交换（0..n-1，比 randint 快）
+                i = int(rand() * n)
+                j = int(rand() * n)
+                if i == j:
+                    continue
+                if i > j:
+                    i, j = j, i
+                # 增量计算能量差，只涉及被替换的两条边
+                delta = two_opt_delta(current_path, i, j)
+            
+            # 接受更优解或根据概率接受较差解，接受后才执行移动
+            if delta < 0 or (temp > 1e-9 and rand() < exp(-delta / temp)):
+                if current_is_best and delta >= 0:
+                    best_path[:] = current_path
+                    current_is_best = False
+                if or_opt:
+                    or_opt_move(current_path, i, j, p)
+                else:
+                    two_opt_swap(current_path, i, j)
+                current_dist += delta
+                if current_dist < best_dist:
+                    best_dist = current_dist
+                    current_is_best = True
             
             # 降温
             temp *= cooling_rate
             if temp < 1.0:
                 break
         
-        return best_path
+        return current_path if current_is_best else best_path
     
-    # 精确解：枚举所有排列（n <= 12）
-    def solve_exact_internal(self, waypoints: List[Coordinate]) -> List[int]:
-        n = len(waypoints)
+    # 精确解：Held-Karp 动态规划（n <= 12），返回 nodes 的一个排列
+    def solve_exact_internal(self, nodes: Sequence[int]) -> List[int]:
+        n = len(nodes)
         if n > 12:
             # 对于 n > 12，退化为模拟退火
-            return self.simulated_annealing(waypoints)
+            return self.simulated_annealing(nodes)
+        if n == 0:
+            return []
         
-        best_perm = list(range(n))
-        best_dist = self.calculate_path_distance(self.extract_path(waypoints, best_perm))
+        # 同一组途经点（含顺序）此前已求解过，直接复用
+        idx = np.asarray(nodes, dtype=np.intp)
+        key = np.column_stack((self._lon[idx], self._lat[idx])).tobytes()
+        perm = _exact_order_cache.get(key)
+        if perm is not None:
+            _exact_order_cache.move_to_end(key)
+        else:
+            if numba_available:
+                perm = _held_karp(self._sub_matrix(nodes)).tolist()
+            else:
+                perm = self._held_karp_python(nodes)
+            _exact_order_cache[key] = perm
+            if len(_exact_order_cache) > EXACT_CACHE_MAX:
+                _exact_order_cache.popitem(last=False)
         
-        # 枚举所有排列
-        for perm in itertools.permutations(range(n)):
-            perm_list = list(perm)
-            dist = self.calculate_path_distance(self.extract_path(waypoints, perm_list))
-            if dist < best_dist:
-                best_dist = dist
-                best_perm = perm_list
+        return [nodes[k] for k in perm]
+    
+    # Held-Karp 纯 Python 实现（Numba 不可用时使用），返回 nodes 的局部下标排列
+    def _held_karp_python(self, nodes: Sequence[int]) -> List[int]:
+        n = len(nodes)
+        dist = [[self._D_rows[a][b] for b in nodes] for a in nodes]
+        size = 1 << n
+        inf = float('inf')
+        # dp[S][i]：恰好访问集合 S 且停在 i 的最短路径长度
+        dp = [[inf] * n for _ in range(size)]
+        parent = [[-1] * n for _ in range(size)]
+        for i in range(n):
+            dp[1 << i][i] = 0.0
+        
+        # S | (1 << j) 总大于 S，按数值递增遍历即可保证子集先于超集
+        for S in range(1, size):
+            dp_s = dp[S]
+            for i in range(n):
+                cost = dp_s[i]
+                if cost == inf:
+                    continue
+                row = dist[i]
+                for j in range(n):
+                    if (S >> j) & 1:
+                        continue
+                    T = S | (1 << j)
+                    c = cost + row[j]
+                    if c < dp[T][j]:
+                        dp[T][j] = c
+                        parent[T][j] = i
         
-        return best_perm
+        # 选择最优终点并沿 parent 回溯
+        full = size - 1
+        last = min(range(n), key=lambda i: dp[full][i])
+        perm = []
+        S = full
+        while last != -1:
+            perm.append(last)
+            prev = parent[S][last]
+            S ^= 1 << last
+            last = prev
+        perm.reverse()
+        
+        return perm
     
     # 规划路径的主函数
-    def plan_route(self, starts: List[Coordinate], waypoints: List[Coordinate], ends: List[Coordinate]) -> RouteResult:
+    # lon/lat 依次存放全部起点、途经点和终点：[0, n_starts) 为起点，
+    # [n_starts, n_starts+n_waypoints) 为途经点，其余为终点
+    def plan_route(self, lon: np.ndarray, lat: np.ndarray, n_starts: int, n_waypoints: int) -> RouteResult:
         start_time = time.time()
         
+        self._lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self._lat = np.ascontiguousarray(lat, dtype=np.float64)
+        if self._lon.shape != self._lat.shape or self._lon.ndim != 1:
+            raise ValueError("lon 与 lat 必须是长度相同的一维数组")
+        if n_starts < 0 or n_waypoints < 0 or n_starts + n_waypoints > len(self._lon):
+            raise ValueError("n_starts + n_waypoints 超出坐标数组长度")
+        n_ends = len(self._lon) - n_starts - n_waypoints
+        
+        # 一次性计算全部点的距离矩阵，之后的距离查询均为数组下标访问
+        self._D = self.dist_calc.calculate_matrix(self._lon, self._lat)
+        self._D_rows = self._D.tolist()
+        
+        waypoint_nodes = list(range(n_starts, n_starts + n_waypoints))
+        end_offset = n_starts + n_waypoints
+        
         best_full_path = []
         best_total_distance = float('inf')
         best_start_idx = 0
         best_end_idx = 0
         
-        # 遍历所有可能的起点和终点组合
-        for si in range(len(starts)):
-            for ei in range(len(ends)):
-                # 根据途经点数量选择算法
-                if len(waypoints) <= 12:
-                    internal_order = self.solve_exact_internal(waypoints)
-                else:
-                    internal_order = self.simulated_annealing(waypoints)
-                    if self.config.enable_local_search:
-                        internal_order = self.two_opt_optimize(waypoints, internal_order)
-                
-                # 构建完整路径
-                full_path = [starts[si]]
-                for idx in internal_order:
-                    full_path.append(waypoints[idx])
-                full_path.append(ends[ei])
-                
-                # 计算总距离
-                total_dist = self.calculate_path_distance(full_path)
-                if total_dist < best_total_distance:
-                    best_total_distance = total_dist
-                    best_full_path = full_path
-                    best_start_idx = si
-                    best_end_idx = ei
+        # 途经点内部顺序与所选起终点无关，只需求解一次
+        if n_waypoints <= 12:
+            internal_order = self.solve_exact_internal(waypoint_nodes)
+        else:
+            internal_order = self.simulated_annealing(waypoint_nodes)
+            if self.config.enable_local_search:
+                internal_order = self.two_opt_optimize(internal_order)
+        
+        # 一次性评估所有起点和终点组合：只有首尾两段随 (si, ei) 变化
+        if n_starts > 0 and n_ends > 0:
+            start_nodes = np.arange(n_starts)
+            end_nodes = np.arange(end_offset, end_offset + n_ends)
+            if internal_order:
+                first, last = internal_order[0], internal_order[-1]
+                # 途经点顺序正向、反向走长度相同，两个方向一并比较
+                forward = np.add.outer(self._D[start_nodes, first], self._D[last, end_nodes])
+                backward = np.add.outer(self._D[start_nodes, last], self._D[first, end_nodes])
+                totals = np.stack((forward, backward))
+            else:
+                totals = self._D[np.ix_(start_nodes, end_nodes)][None]
+            
+            direction, si, ei = np.unravel_index(int(np.argmin(totals)), totals.shape)
+            if direction == 1:
+                internal_order = internal_order[::-1]
+            
+            best_full_path = [int(si)] + internal_order + [end_offset + int(ei)]
+            # 按原始 float64 坐标重新计算最终路线长度，结果不受 float32 矩阵舍入影响
+            idx = np.asarray(best_full_path, dtype=np.intp)
+            best_total_distance = self.dist_calc.calculate_polyline(self._lon[idx], self._lat[idx])
+            best_start_idx = int(si)
+            best_end_idx = int(ei)
         
         # 计算执行时间
         end_time = time.time()
@@ -261,7 +456,8 @@ class RoutePlanner:
         
         # 构建结果对象
         result = RouteResult()
-        result.path = best_full_path
+        result.path = self.extract_path(best_full_path)
+        result.path_indices = best_full_path
         result.total_distance = best_total_distance
         result.execution_time_ms = exec_time
         result.start_index = best_start_idx
@@ -269,12 +465,20 @@ class RoutePlanner:
         
         return result
     
-    # 清理距离缓存
+    # 释放本次规划的距离矩阵
     def clear_distance_cache(self):
+        self._D = None
+        self._D_rows = []
         self.dist_calc.clear_distance_cache()
 
 # ===== 辅助函数 =====
 
+# 将坐标对象列表转换为经度、纬度两个数组（plan_route 的输入格式）
+def coordinates_to_arrays(coords: List[Coordinate]) -> Tuple[np.ndarray, np.ndarray]:
+    lon = np.fromiter((p.longitude for p in coords), dtype=np.float64, count=len(coords))
+    lat = np.fromiter((p.latitude for p in coords), dtype=np.float64, count=len(coords))
+    return lon, lat
+
 # 随机生成坐标
 def generate_random_coordinates(count: int, lon_min: float, lon_max: float, lat_min: float, lat_max: float) -> List[Coordinate]:
     coords = []
@@ -297,15 +501,15 @@ def print_result(result: RouteResult):
     print(f"计算耗时: {result.execution_time_ms:.0f} 毫秒")
     print(f"路线顺序 ({len(result.path)}个点):")
     
-    for i, coord in enumerate(result.path):
-        print(f"  {i+1}. 经度={coord.longitude:.6f}, 纬度={coord.latitude:.6f}")
+    for i, (lon, lat) in enumerate(result.path):
+        print(f"  {i+1}. 经度={lon:.6f}, 纬度={lat:.6f}")
     
     # 验证距离计算
     dist_calc = DistanceCalculator()
     verify_dist = 0.0
     print("\n===== 路线验证 =====")
     for i in range(len(result.path) - 1):
-        d = dist_calc.calculate(result.path[i], result.path[i+1])
+        d = dist_calc.calculate(Coordinate(*result.path[i]), Coordinate(*result.path[i+1]))
         print(f"  路段 {i+1}: {d:.2f} 米")
         verify_dist += d
     
@@ -356,7 +560,8 @@ def test_route_planner():
     
     # 执行路径规划
     planner = RoutePlanner(config)
-    result = planner.plan_route(starts, waypoints, ends)
+    lon, lat = coordinates_to_arrays(starts + waypoints + ends)
+    result = planner.plan_route(lon, lat, len(starts), len(waypoints))
     
     # 打印结果
     print_result(result)